@@ -0,0 +1,961 @@
+#!/usr/bin/env python3
+"""
+Tests for the legacy data integrity check
+Unit tests for the pure helpers run anywhere. The content parity test runs
+against two local Postgres instances when CONTENT_PARITY_INTEGRATION=true and
+the DB_* and TARGET_DB_* connection variables point at them.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import struct
+import uuid
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import legacy_data_integrity_check as lic
+import legacy_data_snapshot as snapshot
+
+
+class RecordingConnection:
+    """Answers every query with canned rows and remembers the session settings in force"""
+    
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.settings = {}
+        self.queries = []
+    
+    async def execute(self, query, *args):
+        if "set_config" in query:
+            self.settings.update(zip(*args))
+        return "SELECT 1"
+    
+    async def fetch(self, query, *args):
+        if "current_setting" in query:
+            return [{"name": name, "value": self.settings.get(name, "server default")} for name in args[0]]
+        self.queries.append((query, dict(self.settings)))
+        return self.rows
+    
+    async def fetchrow(self, query, *args):
+        self.queries.append((query, dict(self.settings)))
+        return self.rows[0] if self.rows else None
+
+
+def recording_checker(conn):
+    checker = lic.LegacyDataIntegrityChecker(db_config=lic.db_config_from_env())
+    
+    @asynccontextmanager
+    async def acquire(consistent=True):
+        yield conn
+    
+    checker.acquire = acquire
+    return checker
+
+
+def plan(**overrides):
+    fields = dict(
+        table="ideas",
+        primary_key=["slug"],
+        key_types=["text"],
+        key_collatable=[True],
+        columns=["slug", "created_at"]
+    )
+    fields.update(overrides)
+    return lic.ContentTablePlan(**fields)
+
+
+def column(collation, version, collatable=True):
+    return {"collatable": collatable, "collation": collation, "collation_version": version}
+
+
+class TestContentParity:
+    def test_text_keys_use_byte_order_by_default(self):
+        assert plan().key_expression() == 't."slug" COLLATE "C"'
+    
+    def test_text_keys_keep_index_collation_when_both_sides_agree(self):
+        assert plan(byte_order=False).key_expression() == 't."slug"'
+        predicate, params = plan(byte_order=False).range_predicate(("a",), ("m",))
+        assert predicate == '(t."slug") >= ($1::text) AND (t."slug") < ($2::text)'
+        assert params == ["a", "m"]
+    
+    def test_same_order_needs_matching_collation_and_version(self):
+        same_order = lic.ContentParityChecker.same_order
+        assert same_order(column(None, None, False), column(None, None, False))
+        assert same_order(column("C", None), column("C", None))
+        assert same_order(column("en_US.UTF-8", "2.31"), column("en_US.UTF-8", "2.31"))
+        assert not same_order(column("en_US.UTF-8", "2.27"), column("en_US.UTF-8", "2.31"))
+        assert not same_order(column("en_US.UTF-8", None), column("en_US.UTF-8", None))
+        assert not same_order(column("C", None), column("en_US.UTF-8", "2.31"))
+    
+    @pytest.mark.parametrize("method, extra", [
+        ("range_hash", ()),
+        ("range_rows", ()),
+        ("midpoint", (5,))
+    ])
+    def test_row_text_is_rendered_under_canonical_settings(self, method, extra):
+        conn = RecordingConnection([{"row_count": 1, "chunk_hash": "x", "slug": "a", "row_hash": "y"}])
+        checker = recording_checker(conn)
+        
+        asyncio.run(getattr(lic.ChunkHasher(), method)(checker, plan(), ("a",), None, *extra))
+        
+        (query, settings), = conn.queries
+        assert settings == lic.CANONICAL_TEXT_SETTINGS
+        # Restored once the query is done
+        assert conn.settings["TimeZone"] == "server default"
+
+
+integration = pytest.mark.skipif(
+    os.getenv('CONTENT_PARITY_INTEGRATION', 'false').lower() != 'true' or not os.getenv('TARGET_DB_HOST'),
+    reason="needs two local Postgres instances (CONTENT_PARITY_INTEGRATION=true, DB_*, TARGET_DB_*)"
+)
+
+
+@integration
+def test_content_parity_between_two_databases():
+    table = f"parity_fixture_{uuid.uuid4().hex[:8]}"
+    source = lic.LegacyDataIntegrityChecker(consistent_snapshot=False)
+    target = lic.LegacyDataIntegrityChecker(db_config=source.target_db_config, consistent_snapshot=False)
+    
+    async def run():
+        try:
+            for checker in (source, target):
+                async with checker.acquire() as conn:
+                    await conn.execute(f"""
+                        CREATE TABLE {table} (slug text PRIMARY KEY, created_at timestamptz, score numeric);
+                        INSERT INTO {table}
+                        SELECT 'idea-' || i, timestamptz '2024-01-01 00:00:00+00' + i * interval '1 hour', i / 7.0
+                        FROM generate_series(1, 500) i;
+                    """)
+            async with target.acquire() as conn:
+                await conn.execute(f"UPDATE {table} SET score = -1 WHERE slug = 'idea-250'")
+                await conn.execute(f"DELETE FROM {table} WHERE slug = 'idea-7'")
+            
+            parity = lic.ContentParityChecker(source, target, chunk_rows=64, leaf_rows=8)
+            return await parity.compare_table(table, ["slug"])
+        finally:
+            for checker in (source, target):
+                async with checker.acquire() as conn:
+                    await conn.execute(f"DROP TABLE IF EXISTS {table}")
+                await checker.close_pool()
+    
+    result = asyncio.run(run())
+    assert result["mismatched"] == 1
+    assert result["missing_in_target"] == 1
+    assert result["missing_in_source"] == 0
+
+
+class CursorConnection:
+    """Serves a query's rows only through a cursor, as asyncpg does outside fetch"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.transactions = 0
+    
+    def is_in_transaction(self):
+        return False
+    
+    @asynccontextmanager
+    async def transaction(self, readonly=False):
+        self.transactions += 1
+        yield
+    
+    async def cursor(self, query, *args, prefetch=None):
+        for row in self.rows:
+            yield row
+
+
+class TestIncrementalVerifier:
+    SAVED = {
+        "columns": ["id", "email"], "primary_key": ["id"], "watermark_type": None, "watermark": "100",
+        "relfilenode": 1, "n_tup_del": 0, "n_tup_upd": 5, "boundaries": [["10"], ["20"]],
+        "chunks": [{"count": 10, "hash": "a"}, {"count": 10, "hash": "b"}, {"count": 10, "hash": "c"}]
+    }
+    
+    def verifier(self, monkeypatch, n_tup_upd, immutable_keys=""):
+        monkeypatch.setenv("INCREMENTAL_IMMUTABLE_KEY_TABLES", immutable_keys)
+        verifier = lic.IncrementalVerifier(recording_checker(RecordingConnection()), chunk_rows=10)
+        
+        async def table_columns(checker, table):
+            return [
+                {"column_name": "id", "column_type": "bigint", "collatable": False},
+                {"column_name": "email", "column_type": "text", "collatable": True}
+            ]
+        
+        async def table_state(plan, watermark_type):
+            return {"n_tup_del": 0, "n_tup_upd": n_tup_upd, "relfilenode": 1, "snapshot": "120:120:", "watermark": None}
+        
+        async def decode_keys(plan, keys):
+            return [(10,), (20,)]
+        
+        async def changed_chunks(plan, saved, boundaries, chunk_count):
+            # A row's key was updated from 5 to 25: only chunk 2 holds a changed row
+            return 1, [2]
+        
+        async def range_count(plan, low, high):
+            return 9 if low is None else 10
+        
+        async def hash_chunks(plan, bounds, indexes):
+            return [{"count": 9 if i == 0 else 11, "hash": f"new{i}"} for i in indexes]
+        
+        verifier.table_columns = table_columns
+        verifier.table_state = table_state
+        verifier.decode_keys = decode_keys
+        verifier.changed_chunks = changed_chunks
+        verifier.range_count = range_count
+        verifier.hash_chunks = hash_chunks
+        return verifier
+    
+    def run(self, verifier):
+        saved = json.loads(json.dumps(self.SAVED))
+        return asyncio.run(verifier.verify_table("users", ["id"], saved))
+    
+    def test_a_moved_primary_key_refreshes_the_chunk_it_left(self, monkeypatch):
+        result = self.run(self.verifier(monkeypatch, n_tup_upd=6))
+        assert result["status"] == "incremental"
+        assert result["recounted_chunks"] == 2 and result["refreshed_chunks"] == 2
+        assert [chunk["hash"] for chunk in result["state"]["chunks"]] == ["new0", "b", "new2"]
+        assert result["row_count"] == 30
+    
+    def test_no_recount_without_updates_or_for_immutable_keys(self, monkeypatch):
+        for verifier in (self.verifier(monkeypatch, 5), self.verifier(monkeypatch, 6, "users")):
+            result = self.run(verifier)
+            assert result["recounted_chunks"] == 0 and result["refreshed_chunks"] == 1
+    
+    def test_xmin_watermark_is_reported_as_unindexed(self, monkeypatch):
+        result = self.run(self.verifier(monkeypatch, 5))
+        assert result["watermark"] == "xmin" and result["watermark_indexed"] is False
+    
+    def test_watermark_index_must_lead_with_the_column_and_cover_every_row(self):
+        verifier = lic.IncrementalVerifier(None)
+        index = {"columns": ["updated_at"], "partial": False}
+        assert verifier.watermark_indexed([index])
+        assert not verifier.watermark_indexed([{**index, "columns": ["tenant_id", "updated_at"]}])
+        assert not verifier.watermark_indexed([{**index, "partial": True}])
+    
+    def test_changed_keys_stream_through_a_cursor_into_chunk_indexes(self):
+        conn = CursorConnection([(3,), (15,), (17,), (40,)])
+        verifier = lic.IncrementalVerifier(recording_checker(conn))
+        changed = asyncio.run(verifier.changed_chunks(plan(
+            table="users", primary_key=["id"], key_types=["bigint"], key_collatable=[False]
+        ), self.SAVED, [(10,), (20,)], 3))
+        assert changed == (4, [0, 1, 2]) and conn.transactions == 1
+
+
+class TestOrphanDetector:
+    def test_grouped_probes_anti_join_on_the_parent_table(self):
+        conn = RecordingConnection([(False, False)])
+        checker = recording_checker(conn)
+        checker.explain_orphan_plans = False
+        detector = lic.OrphanDetector(checker)
+        fks = [
+            lic.ForeignKey("projects_owner_id_fkey", "projects", ("owner_id",), "users", ("id",)),
+            lic.ForeignKey("ideas_author_id_fkey", "ideas", ("author_id",), "users", ("id",))
+        ]
+        results = asyncio.run(detector.check_group(fks))
+        assert [result["status"] for result in results] == ["ok", "ok"]
+        (query, _), = conn.queries
+        assert "WITH" not in query and query.count('FROM "users" p') == 2
+
+
+class TestChunkBoundaries:
+    @pytest.mark.parametrize("chunk_rows", [1, 3])
+    def test_every_chunk_after_the_first_starts_at_a_boundary(self, chunk_rows):
+        # The server returns the first key of every chunk but the first
+        conn = RecordingConnection([(2,), (3,)])
+        boundaries = asyncio.run(lic.ChunkHasher(chunk_rows).chunk_boundaries(recording_checker(conn), plan()))
+        (query, _), = conn.queries
+        assert "(rn - 1) % $1 = 0 AND rn > 1" in query
+        assert boundaries == [(2,), (3,)]
+    
+    def test_chunk_rows_must_be_positive(self, monkeypatch):
+        monkeypatch.setenv("CONTENT_CHUNK_ROWS", "-1")
+        with pytest.raises(ValueError):
+            lic.ChunkHasher()
+
+
+class TestIndexAdvisor:
+    def test_long_index_names_stay_distinct_within_the_identifier_limit(self):
+        # Both names agree on their first 63 bytes
+        prefix = "organization_membership_invitation_workflow_step_"
+        fks = [
+            lic.ForeignKey(f"fk_{column}", "tenant_settings", (column,), "users", ("id",))
+            for column in (prefix + "created_by_user_id", prefix + "revoked_by_user_id")
+        ]
+        statements = [lic.IndexAdvisor.index_statement(fk) for fk in fks]
+        names = [statement.split('"')[1] for statement in statements]
+        assert names[0] != names[1]
+        assert all(len(name.encode()) <= 63 for name in names)
+    
+    def test_short_index_names_are_kept(self):
+        fk = lic.ForeignKey("projects_owner_id_fkey", "projects", ("owner_id",), "users", ("id",))
+        assert '"idx_projects_owner_id"' in lic.IndexAdvisor.index_statement(fk)
+
+
+class TestCostScheduler:
+    def scheduler(self, tmp_path, state):
+        checker = lic.LegacyDataIntegrityChecker(db_config=lic.db_config_from_env(), max_concurrency=1)
+        checker._state_store = lic.RunStateStore(str(tmp_path / "state.json"))
+        checker.scheduler_state().update(state)
+        return checker, lic.CostScheduler(checker, "aggregate scans")
+    
+    def run_order(self, checker, scheduler, sizes):
+        order = []
+        
+        def job(label, size):
+            async def run():
+                order.append(label)
+            return lic.ScheduledJob(label=label, kind="scan", cost_bytes=size, run=run)
+        
+        asyncio.run(scheduler.run([job(label, size) for label, size in sizes.items()]))
+        return order
+    
+    def test_without_history_larger_jobs_go_first(self, tmp_path):
+        checker, scheduler = self.scheduler(tmp_path, {})
+        assert self.run_order(checker, scheduler, {"users": 10, "ideas": 1000, "tenants": 100}) == [
+            "ideas", "tenants", "users"
+        ]
+    
+    def test_a_job_that_ran_slow_for_its_size_moves_forward(self, tmp_path):
+        checker, scheduler = self.scheduler(tmp_path, {
+            "throughput": {"scan": 1000.0},
+            # ideas scanned at a tenth of the average rate last time
+            "job_throughput": {"scan:ideas": 100.0}
+        })
+        assert self.run_order(checker, scheduler, {"users": 5000, "ideas": 1000}) == ["ideas", "users"]
+        assert "scan:users" in checker.scheduler_state()["job_throughput"]
+
+
+class TestFusedScanPlanner:
+    EXPRESSIONS = ["COUNT(*)", "COUNT(DISTINCT email)", "MAX(missing_column)"]
+    
+    def execute(self, tmp_path, error):
+        checker = lic.LegacyDataIntegrityChecker(db_config=lic.db_config_from_env(), max_concurrency=1)
+        checker._state_store = lic.RunStateStore(str(tmp_path / "state.json"))
+        checker.scan_ranges = 1
+        planner = lic.FusedScanPlanner(lic.AggregateSpec("users", expression) for expression in self.EXPRESSIONS)
+        scans = []
+        
+        async def fetch_table_sizes(tables):
+            return {table: 8192 for table in tables}
+        
+        async def fetch(checker, table, expressions, predicate=None):
+            scans.append(expressions)
+            if any(expression.startswith("MAX") for expression in expressions):
+                raise error
+            return [len(expression) for expression in expressions]
+        
+        checker.fetch_table_sizes = fetch_table_sizes
+        planner.fetch = fetch
+        return asyncio.run(planner.execute(checker)), scans
+    
+    def test_a_bad_expression_is_retried_alone(self, tmp_path):
+        values, scans = self.execute(tmp_path, lic.asyncpg.exceptions.UndefinedColumnError("missing_column"))
+        assert len(scans) == 4
+        assert values[lic.AggregateSpec("users", "COUNT(*)")] == len("COUNT(*)")
+        assert isinstance(values[lic.AggregateSpec("users", "MAX(missing_column)")], Exception)
+    
+    def test_a_timeout_fails_every_expression_without_rescanning(self, tmp_path):
+        values, scans = self.execute(tmp_path, lic.asyncpg.exceptions.QueryCanceledError("statement timeout"))
+        assert len(scans) == 1
+        assert all(isinstance(value, lic.asyncpg.exceptions.QueryCanceledError) for value in values.values())
+
+
+class TestAdaptiveConcurrencyLimiter:
+    def test_nested_fan_out_takes_slots_without_deadlocking(self):
+        checker = lic.LegacyDataIntegrityChecker(db_config=lic.db_config_from_env(), max_concurrency=4)
+        running = {"now": 0, "peak": 0}
+        
+        async def leaf():
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+        
+        async def parent():
+            # Like a range-split scan fanning out under its own slot
+            await checker.gather_limited([leaf() for _ in range(4)])
+        
+        async def run(limit):
+            checker.limiter = lic.AdaptiveConcurrencyLimiter(checker)
+            checker.limiter.limit = float(limit)
+            running["peak"] = 0
+            await asyncio.wait_for(checker.gather_limited([parent() for _ in range(3)]), timeout=5)
+            return running["peak"]
+        
+        assert asyncio.run(run(1)) == 1
+        assert asyncio.run(run(2)) == 2
+        assert asyncio.run(run(4)) == 4
+
+
+class TestSampling:
+    def test_proportion_interval_matches_the_wilson_score_interval(self):
+        estimate, lower, upper = lic.proportion_interval(10, 100, 0.95)
+        assert estimate == 0.1
+        assert lower == pytest.approx(0.0552, abs=1e-4)
+        assert upper == pytest.approx(0.1744, abs=1e-4)
+    
+    def test_design_effect_shrinks_the_effective_sample(self):
+        _, _, upper = lic.proportion_interval(0, 100000, 0.99)
+        _, _, clustered = lic.proportion_interval(0, 100000, 0.99, design_effect=50)
+        assert clustered == pytest.approx(lic.proportion_interval(0, 2000, 0.99)[2])
+        assert clustered > upper
+    
+    def test_empty_sample_bounds_nothing(self):
+        assert lic.proportion_interval(0, 0, 0.99) == (0.0, 0.0, 1.0)
+    
+    def test_clean_system_sample_of_a_large_table_cannot_reach_the_default_bound(self):
+        # 10 GiB at 1%: 13,107 blocks of about 60 rows, no orphans
+        blocks, rows = 13107, 13107 * 60
+        design_effect = lic.cluster_design_effect(blocks, 0, rows, 60 * 60 * blocks, 0, 0)
+        assert design_effect == pytest.approx(60)
+        _, _, upper = lic.proportion_interval(0, rows, 0.99, design_effect)
+        assert upper == pytest.approx(5.06e-4, rel=0.01)
+    
+    def test_cluster_design_effect_of_evenly_spread_successes_is_one(self):
+        # 100 blocks of 50 rows, each holding exactly 5 successes
+        effect = lic.cluster_design_effect(100, 500, 5000, 100 * 50 * 50, 100 * 5 * 5, 100 * 50 * 5)
+        assert effect == 1.0
+    
+    def test_cluster_design_effect_of_concentrated_successes_is_capped_at_the_block_size(self):
+        # 100 blocks of 50 rows, all 500 successes in 10 blocks
+        effect = lic.cluster_design_effect(100, 500, 5000, 100 * 50 * 50, 10 * 50 * 50, 10 * 50 * 50)
+        assert 1.0 < effect <= 50.0
+    
+    def test_required_sample_size_reaches_the_bound_exactly(self):
+        n = lic.required_sample_size(1e-5, 0.99)
+        assert lic.proportion_interval(0, n, 0.99)[2] <= 1e-5
+        assert lic.proportion_interval(0, n - 1000, 0.99)[2] > 1e-5
+    
+    def estimator(self, method):
+        checker = lic.LegacyDataIntegrityChecker(db_config=lic.db_config_from_env(), sample_method=method)
+        return lic.SampledOrphanEstimator(lic.OrphanDetector(checker))
+    
+    def test_plan_switches_to_bernoulli_when_system_cannot_pass(self):
+        fk = lic.ForeignKey("ideas_user_id_fkey", "ideas", ("user_id",), "users", ("id",))
+        ten_gib = {"estimated_rows": 13107 * 100 * 60, "heap_bytes": 10 * 1024 ** 3}
+        method, percent = self.estimator('system').plan(fk, ten_gib)
+        assert method == 'bernoulli'
+        assert percent == pytest.approx(1.0)
+    
+    def test_plan_keeps_system_on_tables_large_enough(self):
+        fk = lic.ForeignKey("ideas_user_id_fkey", "ideas", ("user_id",), "users", ("id",))
+        ten_tib = {"estimated_rows": 13107 * 100 * 60 * 1024, "heap_bytes": 10 * 1024 ** 4}
+        method, percent = self.estimator('system').plan(fk, ten_tib)
+        assert method == 'system'
+        assert 1.0 <= percent <= lic.SampledOrphanEstimator.SYSTEM_MAX_PERCENT
+    
+    def test_plan_checks_small_tables_exactly(self):
+        fk = lic.ForeignKey("ideas_user_id_fkey", "ideas", ("user_id",), "users", ("id",))
+        assert self.estimator('bernoulli').plan(fk, {"estimated_rows": 500000, "heap_bytes": 10 ** 8}) is None
+
+
+
+def copy_stream(rows):
+    """A binary COPY stream of rows of already encoded field values"""
+    data = bytearray(snapshot.COPY_SIGNATURE + struct.pack('>ii', 0, 0))
+    for row in rows:
+        data += struct.pack('>h', len(row))
+        for value in row:
+            if value is None:
+                data += struct.pack('>i', -1)
+            else:
+                data += struct.pack('>i', len(value)) + value
+    data += struct.pack('>h', -1)
+    return bytes(data)
+
+
+class TestBinaryCopyReader:
+    ROWS = [
+        (struct.pack('>q', 1), b'alice'),
+        (None, b''),
+        (struct.pack('>q', 3), None)
+    ]
+    
+    def export(self, tmp_path, compression, chunk_size):
+        writers = [
+            snapshot.ColumnWriter(str(tmp_path / "0000.col"), compression, 8),
+            snapshot.ColumnWriter(str(tmp_path / "0001.col"), compression, None)
+        ]
+        reader = snapshot.BinaryCopyReader(writers)
+        reader.PARSE_BYTES = 16
+        stream = copy_stream(self.ROWS)
+        
+        async def run():
+            for start in range(0, len(stream), chunk_size):
+                await reader.feed(stream[start:start + chunk_size])
+            await reader.drain()
+            reader.close()
+        
+        asyncio.run(run())
+        return reader, writers
+    
+    @pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+    def test_fields_are_dealt_to_column_files_whatever_the_chunking(self, tmp_path, chunk_size):
+        reader, (ids, names) = self.export(tmp_path, 'none', chunk_size)
+        assert reader.finished and reader.rows == 3
+        id_records = (tmp_path / "0000.col").read_bytes()
+        # Fixed-width NULLs are zero padded to the column width
+        assert id_records == (
+            struct.pack('>i', 8) + struct.pack('>q', 1)
+            + struct.pack('>i', -1) + bytes(8)
+            + struct.pack('>i', 8) + struct.pack('>q', 3)
+        )
+        assert (tmp_path / "0001.col").read_bytes() == (
+            struct.pack('>i', 5) + b'alice' + struct.pack('>i', 0) + struct.pack('>i', -1)
+        )
+        assert (ids.nulls, names.nulls) == (1, 1)
+        assert ids.hash.hexdigest() == hashlib.sha256(id_records).hexdigest()
+    
+    def test_compressed_columns_hash_their_uncompressed_records(self, tmp_path):
+        _, (ids, _) = self.export(tmp_path, 'gzip', 5)
+        with gzip.open(tmp_path / "0000.col", 'rb') as f:
+            records = f.read()
+        assert ids.bytes == len(records)
+        assert ids.hash.hexdigest() == hashlib.sha256(records).hexdigest()
+    
+    def test_rejects_other_streams(self, tmp_path):
+        reader = snapshot.BinaryCopyReader([])
+        
+        async def run():
+            await reader.feed(b"not a binary copy stream")
+            await reader.drain()
+        
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+
+
+def numeric_field(sign, weight, dscale, *groups):
+    return struct.pack(f'>hhHH{len(groups)}H', len(groups), weight, sign, dscale, *groups)
+
+
+class TestSnapshotDecoders:
+    def test_numeric_keeps_its_display_scale(self):
+        assert str(snapshot.decode_numeric(numeric_field(0x4000, 1, 3, 12, 3456, 7800))) == '-123456.780'
+        assert str(snapshot.decode_numeric(numeric_field(0, -1, 5, 12))) == '0.00120'
+        assert str(snapshot.decode_numeric(numeric_field(0, 0, 2))) == '0.00'
+        assert snapshot.decode_numeric(numeric_field(0xC000, 0, 0)).is_nan()
+    
+    def test_interval_counts_months_as_30_days_and_years_as_365(self):
+        raw = struct.pack('>qii', 1, 2, -14)
+        assert snapshot.decode_interval(raw) == timedelta(days=2 - 365 - 60, microseconds=1)
+    
+    def test_inet_and_cidr_decode_to_ipaddress_objects(self):
+        assert str(snapshot.decode_inet(bytes([2, 32, 0, 4, 10, 0, 0, 5]))) == '10.0.0.5'
+        assert str(snapshot.decode_inet(bytes([2, 24, 0, 4, 10, 0, 0, 5]))) == '10.0.0.5/24'
+        assert str(snapshot.decode_inet(bytes([2, 8, 1, 4, 10, 0, 0, 0]))) == '10.0.0.0/8'
+    
+    @pytest.mark.parametrize("entry, decodes", [
+        ({"base_type": "user_role", "kind": "e"}, True),
+        ({"base_type": "numeric", "kind": "b"}, True),
+        ({"base_type": "integer[]", "kind": "b"}, False),
+        ({"base_type": "tstzrange", "kind": "r"}, False),
+        # Snapshots written before the type kind was recorded
+        ({"base_type": "user_role"}, False)
+    ])
+    def test_only_known_types_have_a_decoder(self, entry, decodes):
+        assert (snapshot.SnapshotReader.decoder(entry) is not None) == decodes
+
+
+USER_IDS = [uuid.UUID(int=n) for n in range(1, 5)]
+
+
+def write_snapshot(path, tables, foreign_keys=()):
+    """A snapshot directory of tables given as {table: [(name, base_type, kind, width, values)]}"""
+    manifest_tables = {}
+    for table, columns in tables.items():
+        os.makedirs(path / table)
+        entries = []
+        for position, (name, base_type, kind, width, values) in enumerate(columns):
+            file = os.path.join(table, f"{position:04d}.col")
+            writer = snapshot.ColumnWriter(str(path / file), 'none', width)
+            for value in values:
+                writer.add(value)
+            writer.close()
+            entries.append({
+                "name": name, "type": base_type, "base_type": base_type, "kind": kind,
+                "width": width, "file": file, "nulls": writer.nulls,
+                "bytes": writer.bytes, "sha256": writer.hash.hexdigest()
+            })
+        manifest_tables[table] = {"rows": len(columns[0][4]), "columns": entries}
+    schema = lic.SchemaSnapshot(
+        fingerprint="test", tables={table: {} for table in tables},
+        foreign_keys=list(foreign_keys), primary_keys={}, indexes={}
+    )
+    with open(path / snapshot.SNAPSHOT_MANIFEST, 'w') as f:
+        json.dump({
+            "format_version": snapshot.SNAPSHOT_FORMAT_VERSION,
+            "compression": "none",
+            "schema": schema.to_dict(),
+            "tables": manifest_tables
+        }, f)
+
+
+@pytest.mark.skipif(snapshot.np is None, reason="numpy is required for snapshots")
+class TestOfflineSnapshotEngine:
+    FK = lic.ForeignKey("projects_owner_id_fkey", "projects", ("owner_id",), "users", ("id",))
+    
+    @pytest.fixture
+    def engine(self, tmp_path):
+        write_snapshot(tmp_path, {
+            "users": [
+                ("id", "uuid", "b", 16, [user_id.bytes for user_id in USER_IDS]),
+                ("role", "user_role", "e", None, [b'admin', b'member', b'admin', None]),
+                ("balance", "numeric", "b", None, [
+                    numeric_field(0, 0, 2, 10), numeric_field(0, 0, 2, 2, 5000),
+                    numeric_field(0, 0, 2, 10), None
+                ]),
+                ("tags", "text[]", "b", None, [b'\x00' * 12, None, None, None])
+            ],
+            "projects": [
+                ("owner_id", "uuid", "b", 16, [
+                    USER_IDS[0].bytes, USER_IDS[1].bytes, uuid.UUID(int=99).bytes, None
+                ])
+            ]
+        }, [self.FK])
+        checker = SimpleNamespace(golden_sample_rows=10, column_profile_tables=['*'])
+        return snapshot.OfflineSnapshotEngine(checker, str(tmp_path))
+    
+    def test_enum_filters_compare_labels(self, engine):
+        spec = {"table": "users", "filter": [["role", "=", "admin"]]}
+        assert engine.golden_rows(spec) == [{"count": 2}]
+    
+    def test_numeric_filters_compare_decimals(self, engine):
+        spec = {"table": "users", "filter": [["balance", ">", 2.25]]}
+        assert engine.golden_rows(spec) == [{"count": 3}]
+    
+    def test_group_by_returns_decoded_values(self, engine):
+        rows = engine.golden_rows({"table": "users", "group_by": ["role"]})
+        assert sorted(rows, key=lambda row: str(row["role"])) == [
+            {"role": None, "count": 1},
+            {"role": "admin", "count": 2},
+            {"role": "member", "count": 1}
+        ]
+    
+    def test_count_distinct_ignores_nulls(self, engine):
+        spec = {"table": "users", "aggregate": "count_distinct", "column": "balance"}
+        assert engine.golden_rows(spec) == [{"balance": 2}]
+    
+    def test_undecodable_columns_raise_instead_of_matching_nothing(self, engine):
+        with pytest.raises(snapshot.UndecodableColumn):
+            engine.golden_rows({"table": "users", "filter": [["tags", "is not null"]]})
+    
+    def test_profile_counts_nulls_of_undecodable_columns(self, engine):
+        profile = engine.profile_table("users")["columns"]
+        assert profile["tags"]["null_fraction"] == 0.75
+        assert profile["tags"]["distinct"] is None and "error" in profile["tags"]
+        assert profile["role"]["distinct"] == 2
+    
+    def test_orphans_are_child_keys_missing_from_the_parent(self, engine):
+        orphaned, checked = engine.orphans(self.FK)
+        assert list(orphaned) == [2]
+        # MATCH SIMPLE skips the NULL key
+        assert list(checked) == [0, 1, 2]
+
+
+def tuple_data(*values):
+    data = struct.pack('>h', len(values))
+    for value in values:
+        if value is None:
+            data += b'n'
+        elif value is lic.UNCHANGED_TOAST:
+            data += b'u'
+        else:
+            data += b't' + struct.pack('>i', len(value.encode())) + value.encode()
+    return data
+
+
+def relation_message(relation_id, table, columns):
+    data = b'R' + struct.pack('>I', relation_id) + b'public\x00' + table.encode() + b'\x00' + b'f'
+    data += struct.pack('>h', len(columns))
+    for name in columns:
+        data += b'\x00' + name.encode() + b'\x00' + struct.pack('>Ii', 25, -1)
+    return data
+
+
+class TestPgOutputDecoder:
+    def decoder(self):
+        decoder = lic.PgOutputDecoder()
+        assert decoder.decode(relation_message(7, "users", ["id", "email"])) is None
+        return decoder
+    
+    def test_insert_carries_the_new_row(self):
+        change = self.decoder().decode(b'I' + struct.pack('>I', 7) + b'N' + tuple_data("1", None))
+        assert change == {
+            "action": "I", "schema": "public", "table": "users",
+            "old": None, "new": {"id": "1", "email": None}
+        }
+    
+    def test_update_keeps_the_full_old_row_and_unchanged_toast_markers(self):
+        change = self.decoder().decode(
+            b'U' + struct.pack('>I', 7)
+            + b'O' + tuple_data("1", "a@example.com")
+            + b'N' + tuple_data("1", lic.UNCHANGED_TOAST)
+        )
+        assert change["old_complete"] is True
+        assert change["old"] == {"id": "1", "email": "a@example.com"}
+        assert change["new"]["email"] is lic.UNCHANGED_TOAST
+    
+    def test_delete_with_only_the_key_is_incomplete(self):
+        change = self.decoder().decode(b'D' + struct.pack('>I', 7) + b'K' + tuple_data("1", None))
+        assert change["action"] == "D" and change["old_complete"] is False
+    
+    def test_truncate_names_the_tables(self):
+        change = self.decoder().decode(b'T' + struct.pack('>i', 1) + b'\x00' + struct.pack('>I', 7))
+        assert change == {"action": "T", "tables": [("public", "users")]}
+    
+    def test_transaction_records_carry_no_change(self):
+        assert self.decoder().decode(b'B' + bytes(20)) is None
+
+
+class TestRecordText:
+    @pytest.mark.parametrize("values, text", [
+        (["1", "plain"], "(1,plain)"),
+        ([None, ""], '(,"")'),
+        (["a b", 'say "hi"', "back\\slash"], '("a b","say ""hi""","back\\\\slash")'),
+        (["tab\there", "(x)", "a,b"], '("tab\there","(x)","a,b")'),
+        # Non-ASCII whitespace is not quoted by record_out
+        (["no\u00a0break", "em\u2003space"], "(no\u00a0break,em\u2003space)")
+    ])
+    def test_matches_record_out(self, values, text):
+        assert lic.record_text(values) == text
+
+
+class ReplicationConnection:
+    """Catalog answers for publication checks; remembers the statements executed"""
+    
+    def __init__(self, publication_exists, published=()):
+        self.publication_exists = publication_exists
+        self.published = published
+        self.executed = []
+    
+    async def fetchval(self, query, *args):
+        return self.publication_exists
+    
+    async def fetch(self, query, *args):
+        return [{"tablename": table} for table in self.published]
+    
+    async def execute(self, query, *args):
+        self.executed.append(query)
+        return "OK"
+
+
+class TestStreamingParityMonitor:
+    def monitor(self, source=None):
+        monitor = lic.StreamingParityMonitor(source, None, tables=["users", "projects"], plugin="pgoutput")
+        monitor.plans = {"users": plan(table="users"), "projects": plan(table="projects")}
+        return monitor
+    
+    def resolve(self, identities, primary_keys):
+        """resolve_tables against canned catalog answers"""
+        conn = RecordingConnection([
+            {"table_name": table, "relreplident": identity} for table, identity in identities.items()
+        ])
+        source = recording_checker(conn)
+        
+        async def get_schema():
+            return lic.SchemaSnapshot("test", {}, [], primary_keys, {})
+        
+        async def plan_table_on(checker, table, primary_key):
+            return plan(table=table, primary_key=primary_key)
+        
+        source.get_schema = get_schema
+        monitor = lic.StreamingParityMonitor(source, None, tables=["users", "projects"], plugin="pgoutput")
+        monitor.hasher.plan_table_on = plan_table_on
+        asyncio.run(monitor.resolve_tables())
+        return monitor
+    
+    def test_refuses_tables_a_publication_would_leave_without_a_replica_identity(self):
+        with pytest.raises(RuntimeError, match="projects"):
+            self.resolve({"users": "d", "projects": "d"}, {"users": ["id"]})
+        with pytest.raises(RuntimeError, match="users"):
+            self.resolve({"users": "n", "projects": "d"}, {"users": ["id"], "projects": ["id"]})
+    
+    def test_publishes_only_tables_that_can_be_streamed(self):
+        # FULL identity is safe to publish, but chunking still needs a primary key
+        monitor = self.resolve({"users": "d", "projects": "f"}, {"users": ["id"]})
+        assert monitor.streamed_tables() == ["users"]
+    
+    def test_seen_by_seed_follows_the_snapshot_visibility_rules(self):
+        monitor = self.monitor()
+        monitor.seed_snapshot = (100, 105, {102})
+        assert monitor.seen_by_seed(99)
+        assert monitor.seen_by_seed(104)
+        # In progress when the snapshot was taken, or started after it
+        assert not monitor.seen_by_seed(102)
+        assert not monitor.seen_by_seed(105)
+    
+    def test_seen_by_seed_widens_32_bit_xids_across_the_epoch(self):
+        monitor = self.monitor()
+        epoch = 1 << 32
+        monitor.seed_snapshot = (epoch + 10, epoch + 20, set())
+        assert monitor.seen_by_seed(15)
+        assert monitor.seen_by_seed(epoch - 5)
+        assert not monitor.seen_by_seed(25)
+    
+    def test_creates_a_missing_publication_for_the_streamed_tables(self):
+        monitor = self.monitor()
+        conn = ReplicationConnection(publication_exists=False)
+        asyncio.run(monitor.ensure_publication(conn))
+        assert conn.executed == [f'CREATE PUBLICATION "{monitor.publication}" FOR TABLE "users", "projects"']
+        assert monitor.created_publication
+    
+    def test_rejects_an_existing_publication_missing_a_streamed_table(self):
+        monitor = self.monitor()
+        conn = ReplicationConnection(publication_exists=True, published=["users"])
+        with pytest.raises(RuntimeError, match="projects"):
+            asyncio.run(monitor.ensure_publication(conn))
+        assert not conn.executed and not monitor.created_publication
+    
+    def test_run_drops_the_publication_it_created(self):
+        conn = ReplicationConnection(publication_exists=False)
+        monitor = self.monitor(recording_checker(conn))
+        
+        async def create_slot():
+            await monitor.ensure_publication(conn)
+            raise RuntimeError("replication slots are exhausted")
+        
+        async def resolve_tables():
+            pass
+        
+        monitor.resolve_tables = resolve_tables
+        monitor.create_slot = create_slot
+        result = asyncio.run(monitor.run(duration_seconds=0))
+        assert result.status == "FAIL"
+        assert conn.executed[-1] == f'DROP PUBLICATION IF EXISTS "{monitor.publication}"'
+        assert not monitor.created_publication
+
+
+class TestStreamedTable:
+    def table(self):
+        streamed = lic.StreamedTable(plan(table="users", primary_key=["id"], key_types=["bigint"],
+                                          key_collatable=[False], columns=["id", "email"]), [("10",)], False)
+        streamed.chunk_counts = [5, 5]
+        streamed.row_count = 10
+        return streamed
+    
+    def test_a_delete_without_the_old_key_disables_only_that_table(self):
+        streamed = self.table()
+        streamed.apply({"action": "D", "schema": "public", "table": "users", "old": None, "new": None})
+        assert streamed.disabled and streamed.row_count == 10
+    
+    def test_a_delete_with_the_key_is_counted_in_its_chunk(self):
+        streamed = self.table()
+        streamed.apply({"action": "D", "old": {"id": "12"}, "new": None, "old_complete": False})
+        assert streamed.chunk_counts == [5, 4] and not streamed.disabled
+    
+    def test_a_new_change_restarts_the_drift_period(self):
+        streamed = self.table()
+        streamed.mismatched[1] = 0.0
+        streamed.apply({"action": "I", "old": None, "new": {"id": "11", "email": "a@example.com"}})
+        assert 1 not in streamed.mismatched and 1 in streamed.dirty
+
+
+class TestParentKeySet:
+    def test_sorted_array_answers_exactly(self):
+        keys = lic.ParentKeySet(memory_bytes=1024)
+        for key in (1, 5, 5, 9):
+            keys.add(key)
+        assert keys.kind == "sorted-array" and keys.count == 3
+        assert [key in keys for key in (1, 4, 5, 9, 10)] == [True, False, True, True, False]
+        assert keys.false_positive_rate() == 0.0
+    
+    def test_keys_must_arrive_in_ascending_order(self):
+        keys = lic.ParentKeySet(memory_bytes=1024)
+        keys.add(5)
+        with pytest.raises(ValueError):
+            keys.add(3)
+    
+    def test_outgrowing_the_budget_switches_to_a_bloom_filter_without_false_negatives(self):
+        keys = lic.ParentKeySet(memory_bytes=64)
+        for key in range(0, 200, 2):
+            keys.add(key)
+        assert keys.kind == "bloom" and keys.memory_used() == 64
+        assert all(key in keys for key in range(0, 200, 2))
+    
+    def test_an_undersized_filter_reports_a_high_false_positive_rate(self):
+        # reltuples said 10 keys, 5000 arrive
+        keys = lic.ParentKeySet(memory_bytes=64, expected_keys=10)
+        sized = keys.false_positive_rate()
+        for key in range(5000):
+            keys.add(key)
+        assert sized == 0.0 and keys.false_positive_rate() > 0.9
+
+
+class TestCrossDatabaseReferentialIntegrity:
+    FK = lic.ForeignKey("projects_owner_id_fkey", "projects", ("owner_id",), "users", ("id",))
+    
+    def run_check(self, monkeypatch, false_positive_rate):
+        checker = lic.LegacyDataIntegrityChecker(db_config=lic.db_config_from_env())
+        checker.cutover_tables = ["projects"]
+        checker.cross_db_max_false_positive_rate = 0.01
+        
+        async def get_schema():
+            return lic.SchemaSnapshot("test", {}, [self.FK], {}, {})
+        
+        @asynccontextmanager
+        async def target_session():
+            yield checker
+        
+        async def run(detector, fks):
+            return [{
+                "constraint": fk.constraint_name, "status": "ok", "has_orphans": False, "orphaned_count": 0,
+                "plan": {"key_set": "bloom", "false_positive_rate": false_positive_rate}
+            } for fk in fks]
+        
+        checker.get_schema = get_schema
+        checker.target_session = target_session
+        monkeypatch.setattr(lic.CrossDatabaseOrphanDetector, "run", run)
+        return asyncio.run(checker.check_cross_database_referential_integrity())
+    
+    def test_a_bloom_filter_within_the_bound_passes(self, monkeypatch):
+        assert self.run_check(monkeypatch, 0.001).status == "PASS"
+    
+    def test_a_bloom_filter_above_the_bound_warns(self, monkeypatch):
+        result = self.run_check(monkeypatch, 0.5)
+        assert result.status == "WARNING"
+        assert result.details["unreliable_foreign_keys"] == ["projects_owner_id_fkey"]
+        assert "CROSS_DB_KEY_MEMORY_BYTES" in result.error_message
+
+
+def distinct_sketch(hashes):
+    """The bit string distinct_sketch_expression builds from 64-bit value hashes"""
+    bits = ['0'] * (lic.SKETCH_REGISTERS * lic.SKETCH_WIDTH)
+    for value_hash in hashes:
+        bucket = value_hash & (lic.SKETCH_REGISTERS - 1)
+        low_bits = (value_hash >> 8) & ((1 << lic.SKETCH_WIDTH) - 1)
+        trailing_zeros = (low_bits & -low_bits).bit_length() - 1 if low_bits else lic.SKETCH_WIDTH - 1
+        bits[bucket * lic.SKETCH_WIDTH + trailing_zeros] = '1'
+    return ''.join(bits)
+
+
+class TestDistinctSketch:
+    @pytest.mark.parametrize("distinct", [10, 300, 5000, 100000])
+    def test_estimate_is_within_the_expected_error(self, distinct):
+        generator = random.Random(distinct)
+        hashes = [generator.getrandbits(64) for _ in range(distinct)]
+        # Repeated values set the same bits
+        estimate = lic.sketch_distinct(distinct_sketch(hashes + hashes[:distinct // 2]))
+        assert abs(estimate - distinct) <= max(2, 0.15 * distinct)
+    
+    def test_sketches_merge_with_bit_or(self):
+        generator = random.Random(0)
+        left = [generator.getrandbits(64) for _ in range(3000)]
+        right = [generator.getrandbits(64) for _ in range(3000)]
+        width = lic.SKETCH_REGISTERS * lic.SKETCH_WIDTH
+        merged = format(int(distinct_sketch(left), 2) | int(distinct_sketch(right), 2), f"0{width}b")
+        assert lic.sketch_distinct(merged) == lic.sketch_distinct(distinct_sketch(left + right))
+    
+    def test_empty_and_missing_sketches_count_nothing(self):
+        assert lic.sketch_distinct(None) == 0
+        assert lic.sketch_distinct(distinct_sketch([])) == 0
+    
+    def test_accepts_asyncpg_bit_strings(self):
+        sketch = distinct_sketch([1 << 8, 2 << 8])
+        assert lic.sketch_distinct(SimpleNamespace(as_string=lambda: sketch)) == lic.sketch_distinct(sketch)
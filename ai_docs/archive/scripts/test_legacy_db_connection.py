@@ -65,20 +65,30 @@ async def test_legacy_connection():
             except Exception as e:
                 print(f"  {table_name}: Error getting count - {e}")
         
-        # Get foreign key constraints
+        # Get foreign key constraints (pg_constraint keeps composite key columns paired)
         fk_query = """
         SELECT 
-            tc.table_name,
-            kcu.column_name,
-            ccu.table_name AS foreign_table_name,
-            ccu.column_name AS foreign_column_name
-        FROM information_schema.table_constraints AS tc
-        JOIN information_schema.key_column_usage AS kcu
-            ON tc.constraint_name = kcu.constraint_name
-        JOIN information_schema.constraint_column_usage AS ccu
-            ON ccu.constraint_name = tc.constraint_name
-        WHERE tc.constraint_type = 'FOREIGN KEY'
-        ORDER BY tc.table_name, kcu.column_name
+            child.relname AS table_name,
+            parent.relname AS foreign_table_name,
+            ARRAY(
+                SELECT a.attname
+                FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                ORDER BY k.ord
+            ) AS columns,
+            ARRAY(
+                SELECT a.attname
+                FROM unnest(con.confkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+                ORDER BY k.ord
+            ) AS foreign_columns
+        FROM pg_constraint con
+        JOIN pg_class child ON child.oid = con.conrelid
+        JOIN pg_class parent ON parent.oid = con.confrelid
+        JOIN pg_namespace n ON n.oid = child.relnamespace
+        WHERE con.contype = 'f'
+        AND n.nspname = 'public'
+        ORDER BY child.relname, con.conname
         """
         
         fks = await conn.fetch(fk_query)
@@ -87,7 +97,9 @@ async def test_legacy_connection():
         print("-" * 50)
         
         for fk in fks:
-            print(f"  {fk['table_name']}.{fk['column_name']} -> {fk['foreign_table_name']}.{fk['foreign_column_name']}")
+            columns = ", ".join(fk['columns'])
+            foreign_columns = ", ".join(fk['foreign_columns'])
+            print(f"  {fk['table_name']}({columns}) -> {fk['foreign_table_name']}({foreign_columns})")
         
         # Test some sample queries
         print(f"\n🧪 Testing Sample Queries:")
@@ -65,6 +65,10 @@ setup(
             "opentelemetry-api>=1.21.0",
             "opentelemetry-sdk>=1.21.0",
         ],
+        "snapshots": [
+            "numpy>=1.24.0",
+            "zstandard>=0.21.0",
+        ],
     },
     entry_points={
         "console_scripts": [